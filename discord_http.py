@@ -0,0 +1,98 @@
+import socket
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+# Server options understood by create_http_session(), with their defaults.
+HTTP_DEFAULTS = {
+    'http_pool_size': 10,
+    'http_pool_connections': 4,
+    'http_pool_block': False,
+    'http_keepalive': True,
+    'http_tcp_keepalive': True,
+    'http_keepalive_idle': 60,
+    'http_keepalive_interval': 15,
+    'http_keepalive_count': 4,
+}
+
+
+def keepalive_socket_options(idle, interval, count):
+    """
+    Returns socket options enabling TCP keep-alive, probing after `idle` seconds of
+    inactivity and every `interval` seconds after that, giving up after `count` probes.
+    Tuning options the platform does not support are skipped.
+    """
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    for name, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count)):
+        if value and hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), int(value)))
+    return options
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections are opened with the given extra socket options."""
+
+    def __init__(self, *args, socket_options=(), **kwargs):
+        # Set before super().__init__(), which calls init_poolmanager().
+        self.socket_options = list(socket_options)
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.socket_options:
+            kwargs['socket_options'] = HTTPConnection.default_socket_options + self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+def create_http_session(serverdata):
+    """
+    Builds a pooled requests session from the http_* server options (see HTTP_DEFAULTS).
+    Returns a (session, adapter) tuple.
+    """
+    settings = dict(HTTP_DEFAULTS, **{key: serverdata[key] for key in HTTP_DEFAULTS if key in serverdata})
+
+    socket_options = ()
+    if settings['http_tcp_keepalive']:
+        socket_options = keepalive_socket_options(settings['http_keepalive_idle'],
+                                                  settings['http_keepalive_interval'],
+                                                  settings['http_keepalive_count'])
+    adapter = KeepAliveHTTPAdapter(
+        pool_connections=settings['http_pool_connections'],
+        pool_maxsize=settings['http_pool_size'],
+        pool_block=settings['http_pool_block'],
+        socket_options=socket_options,
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if not settings['http_keepalive']:
+        session.headers['Connection'] = 'close'
+    return session, adapter
+
+
+def get_pool_stats(adapter):
+    """
+    Returns connection pool statistics for an adapter, keyed by host. `idle` counts
+    open connections waiting in the pool to be reused.
+    """
+    pools = adapter.poolmanager.pools
+    # Read the container directly: indexing a RecentlyUsedContainer moves the pool to
+    # the front of the LRU and would change which pool gets evicted next.
+    with pools.lock:
+        host_pools = list(pools._container.values())
+
+    stats = {}
+    for pool in host_pools:
+        idle, maxsize = 0, 0
+        if pool.pool is not None:
+            with pool.pool.mutex:
+                idle = sum(1 for conn in pool.pool.queue if conn is not None)
+            maxsize = pool.pool.maxsize
+        stats['%s://%s:%s' % (pool.scheme, pool.host, pool.port)] = {
+            'connections_opened': pool.num_connections,
+            'requests': pool.num_requests,
+            'idle': idle,
+            'maxsize': maxsize,
+        }
+    return stats
@@ -0,0 +1,698 @@
+"""
+End-to-end load harness for the Discord protocol module.
+
+Runs a local stand-in for the Discord gateway (websocket) and REST API, points
+PyLinkDiscordProtocol at it and replays synthetic or recorded traffic into a
+source guild at a target rate. A PRIVMSG hook relays every line into a mirror
+guild, so each line takes the whole path: gateway event -> on_message ->
+_add_hook -> relay hook -> DiscordServer.message -> _message_builder -> REST send.
+
+Relay latency is measured from the moment a line is generated to the moment the
+fake REST server receives the send that carries it. Like Discord, the fake REST
+API refuses message content over 2000 characters; lines carried by such a send
+are reported as rejected, and lines the gateway could not dispatch as
+gateway_dropped, separately from lines lost in the relay path. The report also
+includes the protocol's HTTP connection pool statistics.
+
+Usage:
+    python loadtest.py --rate 50 --duration 30
+    python loadtest.py --webhooks --rest-latency 40 --ratelimit 5/5
+    python loadtest.py --replay traffic.jsonl --rate 200 --json
+
+Replay files hold one line of traffic per line: either plain text, or a JSON
+object with "content" and optional "channel" / "author" indices.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import logging
+import math
+import random
+import re
+import struct
+import sys
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+import gevent
+import websocket
+from gevent.pywsgi import WSGIServer
+from gevent.server import StreamServer
+
+from disco.api.http import HTTPClient
+from pylinkirc import conf, utils, world
+from pylinkirc.classes import User
+from pylinkirc.log import log
+
+from protocols.discord import PyLinkDiscordProtocol
+
+NETNAME = 'loadtest'
+SOURCE_GUILD = 'loadtest-source'
+MIRROR_GUILD = 'loadtest-mirror'
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WS_TEXT, WS_BINARY, WS_CLOSE, WS_PING, WS_PONG = (0x1, 0x2, 0x8, 0x9, 0xA)
+
+OP_DISPATCH, OP_HEARTBEAT, OP_IDENTIFY, OP_RESUME = (0, 1, 2, 6)
+OP_INVALID_SESSION, OP_HELLO, OP_HEARTBEAT_ACK = (9, 10, 11)
+
+MARKER_RE = re.compile(r'\blt-(\d+)\b')
+MAX_MESSAGE_LENGTH = 2000
+WORDS = ('relay', 'discord', 'pylink', 'channel', 'latency', 'hello', 'world',
+         'gateway', 'webhook', 'message', 'network', 'test', 'load', 'irc')
+
+_snowflakes = itertools.count(400000000000000000)
+
+
+def next_snowflake():
+    return str(next(_snowflakes))
+
+
+def iso_now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def percentile(values, pct):
+    """Returns the nearest-rank percentile of a sorted list."""
+    if not values:
+        return None
+    rank = max(int(math.ceil(pct / 100.0 * len(values))) - 1, 0)
+    return values[rank]
+
+
+class Stats:
+    """Tracks when each line was generated and when its REST send arrived."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent_at = {}
+        self.delivered_at = {}
+        self.dropped_at = set()
+        self.rejected_at = set()
+        self.rest_requests = 0
+        self.ratelimited = 0
+
+    def sent(self, seq):
+        with self.lock:
+            self.sent_at[seq] = time.time()
+
+    def dropped(self, seq):
+        """Records a line the gateway could not dispatch because its session was gone."""
+        with self.lock:
+            self.dropped_at.add(seq)
+
+    def delivered(self, content):
+        now = time.time()
+        with self.lock:
+            for seq in MARKER_RE.findall(content or ''):
+                self.delivered_at.setdefault(int(seq), now)
+
+    def rejected(self, content):
+        """Records the lines carried by a send that the REST API refused."""
+        with self.lock:
+            for seq in MARKER_RE.findall(content or ''):
+                if int(seq) not in self.delivered_at:
+                    self.rejected_at.add(int(seq))
+
+    def pending(self):
+        with self.lock:
+            finished = set(self.delivered_at) | self.dropped_at | self.rejected_at
+            return len(self.sent_at) - len(finished)
+
+    def report(self):
+        with self.lock:
+            latencies = sorted(self.delivered_at[seq] - self.sent_at[seq]
+                               for seq in self.delivered_at if seq in self.sent_at)
+            first_send = min(self.sent_at.values(), default=None)
+            last_delivery = max(self.delivered_at.values(), default=None)
+            sent = len(self.sent_at)
+            dropped = len(self.dropped_at)
+            rejected = len(self.rejected_at - set(self.delivered_at))
+
+        elapsed = (last_delivery - first_send) if latencies else 0
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 2)
+
+        return {
+            'sent': sent,
+            'delivered': len(latencies),
+            'gateway_dropped': dropped,
+            'rejected': rejected,
+            'lost': sent - dropped - rejected - len(latencies),
+            'latency_p50_ms': ms(percentile(latencies, 50)),
+            'latency_p99_ms': ms(percentile(latencies, 99)),
+            'latency_max_ms': ms(latencies[-1] if latencies else None),
+            'lines_per_second': round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+            'rest_requests': self.rest_requests,
+            'rest_429s': self.ratelimited,
+        }
+
+
+class Fixture:
+    """Builds the Discord objects served by the fake gateway and REST API."""
+
+    def __init__(self, channels, members):
+        self.bot = self._user('loadtest-bot', bot=True)
+        self.users = [self._user('user%d' % n) for n in range(members)]
+        self.channel_names = ['load%d' % n for n in range(channels)]
+        self.channel_guilds = {}
+        self.webhooks = {}
+        self.source = self._guild(SOURCE_GUILD)
+        self.mirror = self._guild(MIRROR_GUILD)
+        self.guilds = [self.source, self.mirror]
+
+    @staticmethod
+    def _user(name, bot=False):
+        return {'id': next_snowflake(), 'username': name, 'discriminator': '0001',
+                'avatar': None, 'bot': bot}
+
+    def _guild(self, name):
+        guild_id = next_snowflake()
+        everyone = {'id': guild_id, 'name': '@everyone', 'position': 0, 'color': 0,
+                    'hoist': False, 'managed': False, 'mentionable': False,
+                    # READ_MESSAGES | SEND_MESSAGES | READ_MESSAGE_HISTORY
+                    'permissions': 0x400 | 0x800 | 0x10000}
+        channels = []
+        for position, channel_name in enumerate(self.channel_names):
+            channel_id = next_snowflake()
+            self.channel_guilds[channel_id] = guild_id
+            channels.append({'id': channel_id, 'guild_id': guild_id, 'type': 0, 'name': channel_name,
+                             'position': position, 'permission_overwrites': [], 'topic': None,
+                             'nsfw': False, 'parent_id': None})
+        members = [{'user': user, 'roles': [], 'joined_at': iso_now(), 'deaf': False,
+                    'mute': False, 'nick': None} for user in [self.bot] + self.users]
+        return {'id': guild_id, 'name': name, 'owner_id': self.users[0]['id'] if self.users else self.bot['id'],
+                'region': 'us-east', 'afk_timeout': 300, 'afk_channel_id': None, 'icon': None,
+                'splash': None, 'verification_level': 0, 'default_message_notifications': 0,
+                'explicit_content_filter': 0, 'mfa_level': 0, 'features': [], 'emojis': [],
+                'roles': [everyone], 'joined_at': iso_now(), 'large': False, 'unavailable': False,
+                'member_count': len(members), 'members': members, 'channels': channels,
+                'presences': [], 'voice_states': []}
+
+    def ready(self):
+        return {'v': 6, 'user': self.bot, 'session_id': uuid.uuid4().hex,
+                'guilds': [{'id': guild['id'], 'unavailable': True} for guild in self.guilds],
+                'private_channels': [], 'relationships': [], '_trace': ['loadtest']}
+
+    def message(self, channel_id, author, content):
+        return {'id': next_snowflake(), 'channel_id': channel_id,
+                'guild_id': self.channel_guilds.get(channel_id), 'author': author,
+                'content': content, 'timestamp': iso_now(), 'edited_timestamp': None,
+                'tts': False, 'mention_everyone': False, 'mentions': [], 'mention_roles': [],
+                'attachments': [], 'embeds': [], 'pinned': False, 'type': 0, 'nonce': None}
+
+    def webhook(self, channel_id):
+        if channel_id not in self.webhooks:
+            webhook_id = next_snowflake()
+            self.webhooks[channel_id] = {'id': webhook_id, 'channel_id': channel_id,
+                                         'guild_id': self.channel_guilds.get(channel_id),
+                                         'name': 'loadtest', 'avatar': None,
+                                         'token': 'token-%s' % webhook_id, 'user': self.bot}
+        return self.webhooks[channel_id]
+
+
+def _recv_exact(sock, length):
+    data = b''
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            raise ConnectionError('socket closed')
+        data += chunk
+    return data
+
+
+def read_frame(sock):
+    """Reads a single (client-masked) websocket frame."""
+    first, second = _recv_exact(sock, 2)
+    length = second & 0x7f
+    if length == 126:
+        length, = struct.unpack('!H', _recv_exact(sock, 2))
+    elif length == 127:
+        length, = struct.unpack('!Q', _recv_exact(sock, 8))
+    mask = _recv_exact(sock, 4) if second & 0x80 else None
+    payload = _recv_exact(sock, length)
+    if mask:
+        payload = bytes(byte ^ mask[n % 4] for n, byte in enumerate(payload))
+    return first & 0x0f, payload
+
+
+def encode_frame(opcode, payload):
+    """Encodes a single unmasked, unfragmented websocket frame."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+class GatewaySession:
+    """A single client connection to the fake gateway."""
+
+    def __init__(self, sock, zlib_stream):
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.compressor = zlib.compressobj() if zlib_stream else None
+
+    def send_raw(self, opcode, payload):
+        with self.lock:
+            self.sock.sendall(encode_frame(opcode, payload))
+
+    def send(self, op, data=None, event=None):
+        with self.lock:
+            packet = {'op': op, 'd': data}
+            if op == OP_DISPATCH:
+                self.seq += 1
+                packet.update(s=self.seq, t=event)
+            payload = json.dumps(packet).encode('utf-8')
+            if self.compressor:
+                payload = self.compressor.compress(payload) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+                self.sock.sendall(encode_frame(WS_BINARY, payload))
+            else:
+                self.sock.sendall(encode_frame(WS_TEXT, payload))
+
+
+class FakeGateway:
+    """Minimal Discord gateway: HELLO, IDENTIFY/READY, heartbeats and dispatches."""
+
+    heartbeat_interval = 41250
+
+    def __init__(self, fixture, stats, latency=0):
+        self.fixture = fixture
+        self.stats = stats
+        self.latency = latency
+        self.session = None
+
+    @staticmethod
+    def _handshake(sock):
+        request = b''
+        while b'\r\n\r\n' not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ConnectionError('socket closed during handshake')
+            request += chunk
+        lines = request.split(b'\r\n\r\n', 1)[0].decode('latin-1').split('\r\n')
+        path = lines[0].split(' ')[1]
+        headers = dict((key.strip().lower(), value.strip())
+                       for key, value in (line.split(':', 1) for line in lines[1:] if ':' in line))
+        accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + WS_GUID).encode()).digest())
+        sock.sendall(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        return path
+
+    def handle(self, sock, address):
+        try:
+            path = self._handshake(sock)
+        except (ConnectionError, OSError, IndexError, KeyError):
+            sock.close()
+            return
+
+        session = GatewaySession(sock, 'compress=zlib-stream' in path)
+        try:
+            session.send(OP_HELLO, {'heartbeat_interval': self.heartbeat_interval, '_trace': ['loadtest']})
+            while True:
+                opcode, payload = read_frame(sock)
+                if opcode == WS_CLOSE:
+                    session.send_raw(WS_CLOSE, payload[:2])
+                    break
+                elif opcode == WS_PING:
+                    session.send_raw(WS_PONG, payload)
+                    continue
+                elif opcode not in (WS_TEXT, WS_BINARY):
+                    continue
+
+                packet = json.loads(payload.decode('utf-8'))
+                if packet['op'] == OP_HEARTBEAT:
+                    session.send(OP_HEARTBEAT_ACK)
+                elif packet['op'] == OP_IDENTIFY:
+                    session.send(OP_DISPATCH, self.fixture.ready(), 'READY')
+                    for guild in self.fixture.guilds:
+                        session.send(OP_DISPATCH, guild, 'GUILD_CREATE')
+                    self.session = session
+                elif packet['op'] == OP_RESUME:
+                    session.send(OP_INVALID_SESSION, False)
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            if self.session is session:
+                self.session = None
+            sock.close()
+
+    def publish(self, seq, message):
+        """Records a line as generated and dispatches it after the configured latency."""
+        session = self.session
+        self.stats.sent(seq)
+        if self.latency:
+            gevent.spawn_later(self.latency, self._dispatch, session, seq, message)
+        else:
+            self._dispatch(session, seq, message)
+
+    def _dispatch(self, session, seq, message):
+        # The session may have closed (or been replaced) while the dispatch was delayed.
+        if session is None or self.session is not session:
+            self.stats.dropped(seq)
+            return
+        try:
+            session.send(OP_DISPATCH, message, 'MESSAGE_CREATE')
+        except OSError:
+            self.stats.dropped(seq)
+
+
+class BucketLimiter:
+    """Per-route fixed window rate limiter emitting Discord style headers."""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def hit(self, key):
+        now = time.time()
+        with self.lock:
+            remaining, reset = self.buckets.get(key, (self.limit, now + self.window))
+            if now >= reset:
+                remaining, reset = self.limit, now + self.window
+            allowed = remaining > 0
+            if allowed:
+                remaining -= 1
+            self.buckets[key] = (remaining, reset)
+
+        headers = [('X-RateLimit-Limit', str(self.limit)),
+                   ('X-RateLimit-Remaining', str(remaining)),
+                   ('X-RateLimit-Reset', str(int(math.ceil(reset)))),
+                   ('X-RateLimit-Reset-After', '%.3f' % (reset - now)),
+                   ('X-RateLimit-Bucket', hashlib.md5(key.encode()).hexdigest()[:16])]
+        return allowed, reset - now, headers
+
+
+class FakeREST:
+    """WSGI stand-in for the parts of the Discord REST API the protocol uses."""
+
+    def __init__(self, fixture, stats, gateway_url, latency=0, limiter=None, webhooks=False):
+        self.fixture = fixture
+        self.stats = stats
+        self.gateway_url = gateway_url
+        self.latency = latency
+        self.limiter = limiter
+        self.webhooks = webhooks
+        self.routes = [
+            ('GET', re.compile(r'^/gateway(/bot)?$'), self._gateway),
+            ('POST', re.compile(r'^/channels/(\d+)/messages$'), self._channel_message),
+            ('GET', re.compile(r'^/channels/(\d+)/webhooks$'), self._channel_webhooks),
+            ('POST', re.compile(r'^/webhooks/(\d+)/([^/]+)$'), self._webhook_execute),
+            ('POST', re.compile(r'^/users/@me/channels$'), self._open_dm),
+        ]
+
+    @staticmethod
+    def _respond(start_response, status, body=None, headers=()):
+        reasons = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found',
+                   429: 'Too Many Requests'}
+        payload = b'' if body is None else json.dumps(body).encode('utf-8')
+        headers = list(headers) + [('Content-Type', 'application/json'),
+                                   ('Content-Length', str(len(payload)))]
+        start_response('%d %s' % (status, reasons[status]), headers)
+        return [payload]
+
+    def __call__(self, environ, start_response):
+        method = environ['REQUEST_METHOD']
+        path = re.sub(r'^/api/v\d+', '', environ['PATH_INFO'])
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        body = environ['wsgi.input'].read(length) if length else b''
+        self.stats.rest_requests += 1
+
+        if self.latency:
+            gevent.sleep(self.latency)
+
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if match and route_method == method:
+                break
+        else:
+            return self._respond(start_response, 404, {'code': 0, 'message': '404: Not Found'})
+
+        headers = []
+        if self.limiter:
+            allowed, retry_after, headers = self.limiter.hit('%s %s' % (method, path))
+            if not allowed:
+                self.stats.ratelimited += 1
+                headers.append(('Retry-After', str(int(math.ceil(retry_after)))))
+                return self._respond(start_response, 429, {'message': 'You are being rate limited.',
+                                                           'retry_after': int(retry_after * 1000),
+                                                           'global': False}, headers)
+
+        payload = json.loads(body.decode('utf-8')) if body else {}
+        status, response = handler(payload, *match.groups())
+        return self._respond(start_response, status, response, headers)
+
+    def _gateway(self, payload, *_):
+        return 200, {'url': self.gateway_url, 'shards': 1}
+
+    def _reject_oversized(self, payload):
+        """Returns Discord's form error if the message content is over the length limit."""
+        content = payload.get('content') or ''
+        if len(content) <= MAX_MESSAGE_LENGTH:
+            return None
+        self.stats.rejected(content)
+        return 400, {'code': 50035, 'message': 'Invalid Form Body',
+                     'errors': {'content': {'_errors': [{
+                         'code': 'BASE_TYPE_MAX_LENGTH',
+                         'message': 'Must be %d or fewer in length.' % MAX_MESSAGE_LENGTH}]}}}
+
+    def _channel_message(self, payload, channel_id):
+        error = self._reject_oversized(payload)
+        if error:
+            return error
+        self.stats.delivered(payload.get('content'))
+        return 200, self.fixture.message(channel_id, self.fixture.bot, payload.get('content', ''))
+
+    def _channel_webhooks(self, payload, channel_id):
+        return 200, [self.fixture.webhook(channel_id)] if self.webhooks else []
+
+    def _webhook_execute(self, payload, webhook_id, token):
+        error = self._reject_oversized(payload)
+        if error:
+            return error
+        self.stats.delivered(payload.get('content'))
+        return 204, None
+
+    def _open_dm(self, payload):
+        recipient = next((user for user in self.fixture.users if user['id'] == str(payload.get('recipient_id'))),
+                         self.fixture.bot)
+        return 200, {'id': next_snowflake(), 'type': 1, 'last_message_id': None, 'recipients': [recipient]}
+
+
+class MirrorRelay:
+    """
+    PRIVMSG hook standing in for the relay plugin: every line said in the source
+    guild is sent to the same channel on the mirror guild.
+    """
+
+    def __init__(self, protocol, webhooks=False):
+        self.protocol = protocol
+        self.webhooks = webhooks
+
+    def _puppet(self, mirror, irc, source):
+        uid = 'loadtest-%s' % source
+        if uid not in mirror.users:
+            user = User(mirror, irc.users[source].nick, int(time.time()), uid, mirror.sid)
+            user.remote = (irc.name, source)
+            mirror.users[uid] = user
+        return uid
+
+    def __call__(self, irc, source, command, args):
+        if irc.name != SOURCE_GUILD:
+            return
+        mirror = self.protocol._children.get(MIRROR_GUILD)
+        if mirror is None or args['target'] not in mirror.channels:
+            return
+
+        if self.webhooks:
+            sender = self._puppet(mirror, irc, source)
+        else:
+            sender = mirror.pseudoclient.uid
+        mirror.message(sender, args['target'], args['text'])
+
+
+def load_replay(path):
+    """Loads recorded traffic as (channel index, author index, content) tuples."""
+    traffic = []
+    with open(path, encoding='utf-8') as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                entry = line
+            if not isinstance(entry, dict):
+                entry = {'content': str(entry)}
+            for field in ('channel', 'author'):
+                value = entry.get(field)
+                if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+                    raise ValueError("Replay file %r line %d: %r must be an integer index, not %r"
+                                     % (path, lineno, field, value))
+            traffic.append((entry.get('channel'), entry.get('author'), str(entry.get('content', ''))))
+    if not traffic:
+        raise ValueError("Replay file %r has no traffic" % path)
+    return traffic
+
+
+def generate_traffic(fixture, options):
+    """Yields (channel id, author, content) for every line to send."""
+    rng = random.Random(options.seed)
+    channels = fixture.source['channels']
+    recorded = itertools.cycle(options.traffic) if options.traffic else None
+    while True:
+        if recorded:
+            channel, author, content = next(recorded)
+        else:
+            channel, author = None, None
+            content = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 20)))
+        channel = rng.randrange(len(channels)) if channel is None else channel % len(channels)
+        author = rng.randrange(len(fixture.users)) if author is None else author % len(fixture.users)
+        yield channels[channel]['id'], fixture.users[author], content
+
+
+def wait_for(predicate, timeout):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        gevent.sleep(0.05)
+    return True
+
+
+def parse_ratelimit(value):
+    if value in ('off', '0'):
+        return None
+    limit, _, window = value.partition('/')
+    limit, window = int(limit), float(window or 1)
+    if limit < 1 or window <= 0:
+        raise ValueError("rate limit must be a positive REQUESTS/SECONDS pair")
+    return BucketLimiter(limit, window)
+
+
+def run(options):
+    stats = Stats()
+    fixture = Fixture(options.channels, options.members)
+
+    gateway = FakeGateway(fixture, stats, options.gateway_latency / 1000.0)
+    gateway_server = StreamServer((options.host, 0), gateway.handle)
+    gateway_server.start()
+
+    rest = FakeREST(fixture, stats, 'ws://%s:%d' % (options.host, gateway_server.server_port),
+                    latency=options.rest_latency / 1000.0, limiter=options.limiter,
+                    webhooks=options.webhooks)
+    rest_server = WSGIServer((options.host, 0), rest, log=None)
+    rest_server.start()
+
+    HTTPClient.BASE_URL = 'http://%s:%d/api/v7' % (options.host, rest_server.server_port)
+    conf.conf['servers'][NETNAME] = {'token': 'loadtest', 'netname': NETNAME}
+    protocol = PyLinkDiscordProtocol(NETNAME)
+    world.networkobjects[NETNAME] = protocol
+
+    if not options.verbose:
+        # The protocol module turns on websocket tracing and DEBUG logging, which would
+        # dominate the numbers being measured.
+        websocket.enableTrace(False)
+        logging.getLogger().setLevel(logging.WARNING)
+        log.setLevel(logging.WARNING)
+
+    utils.add_hook(MirrorRelay(protocol, options.webhooks), 'PRIVMSG')
+    gevent.spawn(protocol.connect)
+
+    def ready():
+        mirror = protocol._children.get(MIRROR_GUILD)
+        return (gateway.session is not None and SOURCE_GUILD in protocol._children and
+                mirror is not None and mirror.connected.is_set() and mirror.pseudoclient is not None)
+
+    if not wait_for(ready, options.ready_timeout):
+        raise RuntimeError("Protocol did not finish bursting both guilds within %ss" % options.ready_timeout)
+
+    interval = 1.0 / options.rate
+    start = time.time()
+    for seq, (channel_id, author, content) in enumerate(generate_traffic(fixture, options)):
+        due = start + seq * interval
+        if due - start >= options.duration:
+            break
+        delay = due - time.time()
+        if delay > 0:
+            gevent.sleep(delay)
+        gateway.publish(seq, fixture.message(channel_id, author, 'lt-%d %s' % (seq, content)))
+
+    wait_for(lambda: stats.pending() <= 0, options.drain)
+    report = stats.report()
+    report['http_pools'] = protocol.get_http_pool_stats()
+
+    world.shutting_down.set()
+    try:
+        protocol.disconnect()
+    except Exception:
+        log.debug('(%s) Error while disconnecting load test network', NETNAME, exc_info=True)
+    rest_server.stop()
+    gateway_server.stop()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='End-to-end load test for the Discord protocol module.')
+    parser.add_argument('--rate', type=float, default=20, help='lines per second to send (default: 20)')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of traffic to send (default: 10)')
+    parser.add_argument('--channels', type=int, default=4, help='channels per guild (default: 4)')
+    parser.add_argument('--members', type=int, default=20, help='members per guild (default: 20)')
+    parser.add_argument('--replay', help='file of recorded traffic to replay instead of synthetic lines')
+    parser.add_argument('--webhooks', action='store_true', help='relay through webhooks instead of the bot user')
+    parser.add_argument('--rest-latency', type=float, default=0, help='added REST response latency in ms')
+    parser.add_argument('--gateway-latency', type=float, default=0, help='added gateway dispatch latency in ms')
+    parser.add_argument('--ratelimit', default='5/5',
+                        help='per-route REST rate limit as REQUESTS/SECONDS, or "off" (default: 5/5)')
+    parser.add_argument('--drain', type=float, default=10, help='seconds to wait for outstanding sends (default: 10)')
+    parser.add_argument('--ready-timeout', type=float, default=30, help='seconds to wait for the burst (default: 30)')
+    parser.add_argument('--host', default='127.0.0.1', help='address the fake servers listen on')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for synthetic traffic')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('--verbose', action='store_true', help='keep the protocol module\'s debug logging')
+    options = parser.parse_args(argv)
+
+    if options.rate <= 0:
+        parser.error('--rate must be greater than 0')
+    if options.duration <= 0:
+        parser.error('--duration must be greater than 0')
+    if options.channels < 1 or options.members < 1:
+        parser.error('--channels and --members must be at least 1')
+    if options.rest_latency < 0 or options.gateway_latency < 0:
+        parser.error('latencies cannot be negative')
+    try:
+        options.limiter = parse_ratelimit(options.ratelimit)
+    except ValueError as e:
+        parser.error('--ratelimit %r: %s' % (options.ratelimit, e))
+    try:
+        options.traffic = load_replay(options.replay) if options.replay else None
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    report = run(options)
+    if options.json:
+        print(json.dumps(report, indent=4))
+    else:
+        for key, value in report.items():
+            print('%-18s %s' % (key, '-' if value is None else value))
+    return 0 if report['delivered'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
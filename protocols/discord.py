@@ -18,6 +18,7 @@ from pylinkirc.log import log
 from pylinkirc.protocols.clientbot import ClientbotWrapperProtocol
 
 from discord_formtter import I2DFormatter
+from discord_http import HTTP_DEFAULTS, create_http_session, get_pool_stats
 
 websocket.enableTrace(True)
 
@@ -268,6 +269,7 @@ class PyLinkDiscordProtocol(PyLinkNetworkCoreWithUtils):
             raise ProtocolError("No API token defined under server settings")
         self.client_config = ClientConfig({'token': self.serverdata['token']})
         self.client = Client(self.client_config)
+        self._init_http_session()
         self.bot_config = BotConfig()
         self.bot = Bot(self.client, self.bot_config)
         self.bot_plugin = DiscordBotPlugin(self, self.bot, self.bot_config)
@@ -276,6 +278,23 @@ class PyLinkDiscordProtocol(PyLinkNetworkCoreWithUtils):
         self._children = {}
         self.message_queue = queue.Queue()
 
+    def _init_http_session(self):
+        """
+        Replaces disco's default HTTP session with a pooled keep-alive session owned by this
+        protocol. All REST calls (message sends, webhook executions, webhook lookups and DMs)
+        for every child DiscordServer go through the same client, so they share this pool.
+        """
+        self.http_session, self.http_adapter = create_http_session(self.serverdata)
+        self.client.api.http.session = self.http_session
+        log.debug('(%s) Using pooled HTTP session with pool size %s', self.name,
+                  self.serverdata.get('http_pool_size', HTTP_DEFAULTS['http_pool_size']))
+
+    def get_http_pool_stats(self):
+        """
+        Returns connection pool statistics for the shared HTTP session, keyed by host.
+        """
+        return get_pool_stats(self.http_adapter)
+
     def _message_builder(self):
         current_channel_senders = {}
         joined_messages = defaultdict(dict)
@@ -399,6 +418,9 @@ class PyLinkDiscordProtocol(PyLinkNetworkCoreWithUtils):
         self.bot.client.gw.session_id = None
         self.bot.client.gw.ws.close()
 
+        # Release the pooled REST connections; the adapter rebuilds its pools on the next request.
+        self.http_session.close()
+
         self._post_disconnect()
 
 Class = PyLinkDiscordProtocol
@@ -0,0 +1,72 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from urllib3.connection import HTTPConnection
+
+from discord_http import HTTP_DEFAULTS, create_http_session, get_pool_stats
+
+
+class OKHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(('127.0.0.1', 0), OKHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%d' % httpd.server_port
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_serverdata_applied_to_adapter():
+    session, adapter = create_http_session({'http_pool_size': 25, 'http_pool_block': True,
+                                            'http_keepalive_idle': 30})
+    assert adapter._pool_maxsize == 25
+    assert adapter._pool_block is True
+    assert adapter._pool_connections == HTTP_DEFAULTS['http_pool_connections']
+
+    options = adapter.poolmanager.connection_pool_kw['socket_options']
+    assert options[:len(HTTPConnection.default_socket_options)] == HTTPConnection.default_socket_options
+    assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in options
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        assert (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30) in options
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        assert (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, HTTP_DEFAULTS['http_keepalive_interval']) in options
+    assert session.headers['Connection'] == 'keep-alive'
+
+
+def test_keepalive_disabled():
+    session, adapter = create_http_session({'http_keepalive': False, 'http_tcp_keepalive': False})
+    assert session.headers['Connection'] == 'close'
+    assert 'socket_options' not in adapter.poolmanager.connection_pool_kw
+
+
+def test_pool_stats(server):
+    session, adapter = create_http_session({'http_pool_size': 3})
+    assert get_pool_stats(adapter) == {}
+
+    session.get(server).close()
+    assert get_pool_stats(adapter) == {
+        server: {'connections_opened': 1, 'requests': 1, 'idle': 1, 'maxsize': 3},
+    }
+
+    # A second request reuses the warm connection.
+    session.get(server).close()
+    assert get_pool_stats(adapter)[server]['connections_opened'] == 1
+    assert get_pool_stats(adapter)[server]['requests'] == 2
+
+    session.close()
+    assert get_pool_stats(adapter) == {}